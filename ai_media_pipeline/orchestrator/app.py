@@ -1,11 +1,23 @@
+import hmac
 import typer
 import os
 import json
+from contextlib import asynccontextmanager
+from enum import Enum
 from typing import Optional
 
-from fastapi import FastAPI, File, UploadFile, Form, Request
+from fastapi import FastAPI, File, UploadFile, Form, Request, Header
 from fastapi.responses import JSONResponse, FileResponse, HTMLResponse
 import uvicorn
+from pydantic import BaseModel
+
+from ai_media_pipeline.orchestrator.backends import config_path, get_registry
+from ai_media_pipeline.orchestrator.sinks import SINK_NAMES, open_sink
+
+AUDIO_EXTS = ['.wav', '.mp3', '.m4a', '.flac', '.ogg']
+IMAGE_EXTS = ['.png', '.jpg', '.jpeg']
+# Choice type for --sink, so an invalid value is rejected before any processing
+SinkName = Enum('SinkName', {name: name for name in SINK_NAMES}, type=str)
 
 app = typer.Typer(help="""
 AI Media Pipeline CLI Orchestrator
@@ -14,6 +26,7 @@ Usage Examples:
   python -m ai_media_pipeline.orchestrator.app process --file samples/input.wav --output outputs/input.json
   python -m ai_media_pipeline.orchestrator.app process --file registration_document.png --output outputs/registration.json
   python -m ai_media_pipeline.orchestrator.app process --file samples/sample.txt --output outputs/reply.wav
+  python -m ai_media_pipeline.orchestrator.app batch --input-dir samples --output outputs/results  # Parquet dataset
   python -m ai_media_pipeline.orchestrator.app serve  # Launch HTTP API (see docs below)
 
 HTTP API:
@@ -22,9 +35,23 @@ HTTP API:
     - voice: (optional, for TTS)
     - rate: (optional, for TTS)
     Returns: JSON (for audio/image) or WAV file (for TTS)
+  GET  /admin/backends                  List backends, active and shadow per stage
+  POST /admin/backends/{stage}/active   {"backend": name} - hot-swap the active backend
+  POST /admin/backends/{stage}/shadow   {"backend": name or null, "fraction": 0.1}
+  GET  /admin/metrics                   Latency, CPU and agreement per backend
+  (admin routes are disabled unless AI_MEDIA_ADMIN_TOKEN is set, and then require it in X-Admin-Token)
 """)
 
-fastapi_app = FastAPI(title="AI Media Pipeline Orchestrator API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shadow traffic is only useful where /admin/metrics can report it, so the CLI
+    # commands never enable it; the server applies the config's shadow section here
+    path = config_path()
+    if os.path.isfile(path):
+        get_registry().load_shadow_config(path)
+    yield
+
+fastapi_app = FastAPI(title="AI Media Pipeline Orchestrator API", lifespan=lifespan)
 
 @fastapi_app.get("/", response_class=HTMLResponse)
 async def root_ui():
@@ -172,8 +199,10 @@ async def root_ui():
     </html>
     """
 
+# Plain def: FastAPI runs it in its threadpool, so blocking stage calls do not stall
+# the event loop and the admin routes stay responsive while requests are in flight
 @fastapi_app.post("/process")
-async def process_api(
+def process_api(
     file: UploadFile = File(...),
     voice: Optional[str] = Form(None),
     rate: Optional[str] = Form(None)  # Accept as string
@@ -187,33 +216,30 @@ async def process_api(
         shutil.copyfileobj(file.file, tmp)
         tmp_path = tmp.name
     try:
-        if ext in ['.wav', '.mp3', '.m4a', '.flac', '.ogg']:
+        if ext in AUDIO_EXTS:
             print(f"[API] Detected audio file. Running transcription...")
-            from ai_media_pipeline.transcribe.transcribe import transcribe_audio
-            from ai_media_pipeline.interpret.interpret import parse_intent
-            result = transcribe_audio(tmp_path)
+            registry = get_registry()
+            result = registry.run('transcribe', tmp_path)
             print(f"[API] Transcription result: {result}")
-            nlu = parse_intent(result['text'])
+            nlu = registry.run('interpret', result['text'])
             print(f"[API] Intent extraction result: {nlu}")
             return JSONResponse(content={'transcription': result, 'intent': nlu})
-        elif ext in ['.png', '.jpg', '.jpeg']:
+        elif ext in IMAGE_EXTS:
             print(f"[API] Detected image file. Running OCR extraction...")
-            from ai_media_pipeline.extract.extract import parse_document
-            result = parse_document(tmp_path)
+            result = get_registry().run('extract', tmp_path)
             print(f"[API] OCR result: {result}")
             return JSONResponse(content=result)
         elif ext in ['.txt']:
             print(f"[API] Detected text file. Running intent extraction and TTS...")
             rate_val = int(rate) if rate and rate.strip() else None
-            from ai_media_pipeline.interpret.interpret import parse_intent
-            from ai_media_pipeline.synthesize.synth import text_to_speech
+            registry = get_registry()
             with open(tmp_path) as f:
                 text = f.read()
             print(f"[API] Text for TTS: {text}")
-            nlu = parse_intent(text)
+            nlu = registry.run('interpret', text)
             print(f"[API] Intent extraction result: {nlu}")
             with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as out_tmp:
-                wav_path = text_to_speech(text, voice=voice, rate=rate_val, output_path=out_tmp.name)
+                wav_path = registry.run('synthesize', text, voice=voice, rate=rate_val, output_path=out_tmp.name)
             print(f"[API] TTS output path: {wav_path}")
             headers = {"X-Intent": json.dumps(nlu)}
             return FileResponse(wav_path, media_type="audio/wav", filename="reply.wav", headers=headers)
@@ -227,12 +253,91 @@ async def process_api(
     finally:
         os.remove(tmp_path)
 
+class ActiveBackend(BaseModel):
+    backend: str
+
+class ShadowBackend(BaseModel):
+    backend: Optional[str] = None
+    fraction: float = 0.1
+
+def _admin_error(x_admin_token: Optional[str]) -> Optional[JSONResponse]:
+    token = os.environ.get("AI_MEDIA_ADMIN_TOKEN")
+    if not token:
+        return JSONResponse(content={"error": "Admin API disabled: set AI_MEDIA_ADMIN_TOKEN."}, status_code=403)
+    if not hmac.compare_digest((x_admin_token or "").encode(), token.encode()):
+        return JSONResponse(content={"error": "Invalid admin token."}, status_code=403)
+    return None
+
+@fastapi_app.get("/admin/backends")
+async def list_backends(x_admin_token: Optional[str] = Header(None)):
+    error = _admin_error(x_admin_token)
+    if error:
+        return error
+    return JSONResponse(content=get_registry().describe())
+
+@fastapi_app.post("/admin/backends/{stage}/active")
+def set_active_backend(stage: str, body: ActiveBackend, x_admin_token: Optional[str] = Header(None)):
+    error = _admin_error(x_admin_token)
+    if error:
+        return error
+    try:
+        get_registry().set_active(stage, body.backend)
+    except KeyError as e:
+        return JSONResponse(content={"error": str(e.args[0])}, status_code=404)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    print(f"[API] Active backend for {stage} switched to {body.backend}")
+    return JSONResponse(content=get_registry().describe()[stage])
+
+@fastapi_app.post("/admin/backends/{stage}/shadow")
+def set_shadow_backend(stage: str, body: ShadowBackend, x_admin_token: Optional[str] = Header(None)):
+    error = _admin_error(x_admin_token)
+    if error:
+        return error
+    try:
+        get_registry().set_shadow(stage, body.backend, body.fraction)
+    except KeyError as e:
+        return JSONResponse(content={"error": str(e.args[0])}, status_code=404)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    print(f"[API] Shadow backend for {stage} set to {body.backend} ({body.fraction:.0%})")
+    return JSONResponse(content=get_registry().describe()[stage])
+
+@fastapi_app.get("/admin/metrics")
+async def backend_metrics(x_admin_token: Optional[str] = Header(None)):
+    error = _admin_error(x_admin_token)
+    if error:
+        return error
+    return JSONResponse(content=get_registry().metrics())
+
+
+def _process_media(file: str):
+    """
+    Run the audio or image pipeline on file. Returns (kind, result) with kind 'audio' or 'image'.
+    """
+    ext = os.path.splitext(file)[1].lower()
+    if ext in AUDIO_EXTS:
+        typer.echo("[DEBUG] Detected audio file. Running transcription...")
+        registry = get_registry()
+        result = registry.run('transcribe', file)
+        typer.echo(f"[Transcription] {result['text']}")
+        typer.echo("[DEBUG] Running intent extraction...")
+        nlu = registry.run('interpret', result['text'])
+        typer.echo(f"[Intent] {json.dumps(nlu, indent=2)}")
+        return 'audio', {'transcription': result, 'intent': nlu}
+    typer.echo("[DEBUG] Detected image file. Running OCR extraction...")
+    result = get_registry().run('extract', file)
+    typer.echo(f"[Extracted Fields] {json.dumps(result, indent=2)}")
+    return 'image', result
+
+
 @app.command()
 def process(
     file: str = typer.Option(..., '--file', '-f', help='Input file path (.wav, .png, .txt)'),
-    output: str = typer.Option(..., '--output', '-o', help='Output file path (JSON or WAV)'),
+    output: str = typer.Option(..., '--output', '-o', help='Output file path (JSON or WAV), or a directory for --sink parquet'),
     voice: Optional[str] = typer.Option(None, '--voice', help='Voice for TTS'),
     rate: Optional[int] = typer.Option(None, '--rate', help='Speech rate for TTS'),
+    sink: SinkName = typer.Option('json', '--sink', help='Result sink for audio/image results: json or parquet'),
 ):
     """
     Process an input file (audio, image, or text) and output the result.
@@ -240,35 +345,19 @@ def process(
     typer.echo(f"[DEBUG] Starting process for file: {file} -> {output}")
     ext = os.path.splitext(file)[1].lower()
     try:
-        if ext in ['.wav', '.mp3', '.m4a', '.flac', '.ogg']:
-            typer.echo("[DEBUG] Detected audio file. Running transcription...")
-            from ai_media_pipeline.transcribe.transcribe import transcribe_audio
-            from ai_media_pipeline.interpret.interpret import parse_intent
-            result = transcribe_audio(file)
-            typer.echo(f"[Transcription] {result['text']}")
-            typer.echo("[DEBUG] Running intent extraction...")
-            nlu = parse_intent(result['text'])
-            typer.echo(f"[Intent] {json.dumps(nlu, indent=2)}")
-            with open(output, 'w') as f:
-                json.dump({'transcription': result, 'intent': nlu}, f, indent=2)
-            typer.echo(f"[DEBUG] Output written to {output}")
-        elif ext in ['.png', '.jpg', '.jpeg']:
-            typer.echo("[DEBUG] Detected image file. Running OCR extraction...")
-            from ai_media_pipeline.extract.extract import parse_document
-            result = parse_document(file)
-            typer.echo(f"[Extracted Fields] {json.dumps(result, indent=2)}")
-            with open(output, 'w') as f:
-                json.dump(result, f, indent=2)
+        if ext in AUDIO_EXTS + IMAGE_EXTS:
+            kind, result = _process_media(file)
+            with open_sink(sink.value, output) as result_sink:
+                result_sink.write(file, kind, result)
             typer.echo(f"[DEBUG] Output written to {output}")
         elif ext in ['.txt']:
             typer.echo("[DEBUG] Detected text file. Running intent extraction and TTS...")
-            from ai_media_pipeline.interpret.interpret import parse_intent
-            from ai_media_pipeline.synthesize.synth import text_to_speech
+            registry = get_registry()
             with open(file) as f:
                 text = f.read()
-            nlu = parse_intent(text)
+            nlu = registry.run('interpret', text)
             typer.echo(f"[Intent] {json.dumps(nlu, indent=2)}")
-            wav_path = text_to_speech(text, voice=voice, rate=rate, output_path=output)
+            wav_path = registry.run('synthesize', text, voice=voice, rate=rate, output_path=output)
             typer.echo(f"[DEBUG] Audio reply written to {wav_path}")
         else:
             typer.echo("[ERROR] Unsupported file type.", err=True)
@@ -277,6 +366,38 @@ def process(
         typer.echo(f"[ERROR] Exception occurred: {e}", err=True)
         raise typer.Exit(1)
 
+@app.command()
+def batch(
+    input_dir: str = typer.Option(..., '--input-dir', '-i', help='Directory of audio/image files to process'),
+    output: str = typer.Option(..., '--output', '-o', help='Output directory'),
+    sink: SinkName = typer.Option('parquet', '--sink', help='Result sink: parquet (append-only dataset) or json (one file per input)'),
+    batch_size: int = typer.Option(1024, '--batch-size', help='Rows per Parquet row group'),
+):
+    """
+    Process every audio and image file in a directory and write the results to one sink.
+    """
+    if not os.path.isdir(input_dir):
+        typer.echo(f"[ERROR] Input directory not found: {input_dir}", err=True)
+        raise typer.Exit(1)
+    files = sorted(
+        os.path.join(input_dir, name) for name in os.listdir(input_dir)
+        if os.path.splitext(name)[1].lower() in AUDIO_EXTS + IMAGE_EXTS
+    )
+    typer.echo(f"[DEBUG] Found {len(files)} files in {input_dir}")
+    os.makedirs(output, exist_ok=True)
+    failed = 0
+    with open_sink(sink.value, output, batch_size=batch_size) as result_sink:
+        for file in files:
+            try:
+                kind, result = _process_media(file)
+                result_sink.write(file, kind, result)
+            except Exception as e:
+                failed += 1
+                typer.echo(f"[ERROR] {file}: {e}", err=True)
+    typer.echo(f"[DEBUG] Processed {len(files) - failed}/{len(files)} files -> {output}")
+    if failed:
+        raise typer.Exit(1)
+
 @app.command()
 def serve():
     """Run the HTTP API server (FastAPI) on http://0.0.0.0:8000"""
@@ -0,0 +1,424 @@
+import importlib
+import os
+import random
+import re
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+# Built-in backends per stage, as "module:function" import paths resolved on first use
+DEFAULT_BACKENDS = {
+    "transcribe": {"whisper": "ai_media_pipeline.transcribe.transcribe:transcribe_audio"},
+    "interpret": {"spacy": "ai_media_pipeline.interpret.interpret:parse_intent"},
+    "extract": {"tesseract": "ai_media_pipeline.extract.extract:parse_document"},
+    "synthesize": {"pyttsx3": "ai_media_pipeline.synthesize.synth:text_to_speech"},
+}
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", "", (text or "").lower())).strip()
+
+
+def _same_text(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    return _normalize_text(a.get("text", "")) == _normalize_text(b.get("text", ""))
+
+
+def _same_intent(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    return a.get("intent") == b.get("intent") and a.get("params") == b.get("params")
+
+
+def _copy_input_file(args: tuple, kwargs: dict) -> Tuple[tuple, dict, Callable[[], None]]:
+    # The caller may delete its input file as soon as the primary call returns. A hard link
+    # keeps the data alive without copying it on the request thread; copy only if linking
+    # fails (e.g. the temp dir is on another filesystem).
+    src = args[0]
+    tmp_dir = tempfile.mkdtemp(prefix="shadow-")
+    private_path = os.path.join(tmp_dir, os.path.basename(src))
+    try:
+        os.link(src, private_path)
+    except OSError:
+        try:
+            shutil.copyfile(src, private_path)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+    return (private_path,) + tuple(args[1:]), kwargs, lambda: shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _separate_output_path(args: tuple, kwargs: dict) -> Tuple[tuple, dict, Callable[[], None]]:
+    # Never let the shadow backend overwrite the primary's audio reply
+    fd, out_path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    kwargs = dict(kwargs, output_path=out_path)
+    return args, kwargs, lambda: os.path.exists(out_path) and os.remove(out_path)
+
+
+# Per-stage hooks: how to compare outputs and how to isolate shadow side effects
+STAGE_HOOKS = {
+    "transcribe": {"compare": _same_text, "prepare_shadow": _copy_input_file},
+    "interpret": {"compare": _same_intent, "prepare_shadow": None},
+    "extract": {"compare": _same_text, "prepare_shadow": _copy_input_file},
+    "synthesize": {"compare": None, "prepare_shadow": _separate_output_path},
+}
+
+
+def _resolve(target: Union[str, Callable]) -> Callable:
+    if callable(target):
+        return target
+    module_name, _, attr = target.partition(":")
+    fn = getattr(importlib.import_module(module_name), attr)
+    if not callable(fn):
+        raise TypeError(f"{target} is not callable")
+    return fn
+
+
+def _thread_cpu_seconds() -> float:
+    # CPU of the calling thread only, so concurrent calls do not pollute each other
+    if hasattr(resource, "RUSAGE_THREAD"):
+        usage = resource.getrusage(resource.RUSAGE_THREAD)
+        return usage.ru_utime + usage.ru_stime
+    return time.thread_time()
+
+
+def _children_cpu_seconds() -> float:
+    # CPU of finished child processes (e.g. the tesseract binary run by pytesseract)
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class _Stats:
+    """
+    Rolling latency / CPU samples for one backend of one stage in one role (primary or shadow).
+    """
+
+    def __init__(self, window: int):
+        self.calls = 0
+        self.errors = 0
+        self.latency_ms = deque(maxlen=window)
+        self.cpu_ms = deque(maxlen=window)
+
+    def record(self, latency_ms: float, cpu_ms: float, ok: bool) -> None:
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+        self.latency_ms.append(latency_ms)
+        self.cpu_ms.append(cpu_ms)
+
+    def summary(self) -> Dict[str, Any]:
+        lat = sorted(self.latency_ms)
+
+        def pct(p: float) -> Optional[float]:
+            return round(lat[min(int(p * len(lat)), len(lat) - 1)], 2) if lat else None
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_ms": {
+                "mean": round(sum(lat) / len(lat), 2) if lat else None,
+                "p50": pct(0.5),
+                "p95": pct(0.95),
+            },
+            "cpu_ms_mean": round(sum(self.cpu_ms) / len(self.cpu_ms), 2) if self.cpu_ms else None,
+            "cpu_samples": len(self.cpu_ms),
+        }
+
+
+class StageRegistry:
+    """
+    Maps each pipeline stage to named backends and routes calls to the active one.
+
+    Switching the active backend is atomic: a call resolves its backend once when it
+    starts, so in-flight requests finish on the backend they started with. A shadow
+    backend can be attached per stage; a `fraction` of calls are mirrored to it on a
+    background thread and its latency, CPU time and output agreement are recorded next
+    to the primary's, in separate primary and shadow stats. Shadow results are never
+    returned to the caller.
+
+    CPU time is recorded for every call: the calling thread's CPU plus the CPU of child
+    processes that finished during the call. Work a library runs on its own native thread
+    pool (e.g. torch intra-op threads) is not counted. Child CPU is only reported by the OS
+    per process, so a subprocess from an overlapping call can land in this call's sample.
+    """
+
+    def __init__(self, shadow_workers: int = 2, max_pending_shadow: int = 8, window: int = 1000):
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._backends: Dict[str, Dict[str, Union[str, Callable]]] = {}
+        self._active: Dict[str, str] = {}
+        self._shadow: Dict[str, Tuple[str, float]] = {}
+        self._stats: Dict[Tuple[str, str, str], _Stats] = {}
+        self._agreement: Dict[Tuple[str, str, str], list] = {}
+        self._shadow_dropped: Dict[str, int] = {}
+        self._pending_shadow = 0
+        self._max_pending_shadow = max_pending_shadow
+        self._window = window
+        self._executor = ThreadPoolExecutor(max_workers=shadow_workers, thread_name_prefix="shadow")
+
+    def register(self, stage: str, name: str, target: Union[str, Callable], active: bool = False) -> None:
+        """
+        Add a backend for stage. target is a callable or a "module:function" import path.
+        The first backend registered for a stage becomes active.
+        """
+        with self._lock:
+            self._backends.setdefault(stage, {})[name] = target
+            if active or stage not in self._active:
+                self._active[stage] = name
+
+    def set_active(self, stage: str, name: str) -> None:
+        """
+        Switch stage to backend `name`. Raises KeyError if it is not registered and
+        ValueError if it cannot be imported, leaving the current backend in place.
+        """
+        self._load(stage, name)
+        with self._lock:
+            self._active[stage] = name
+            # A backend cannot shadow itself
+            if self._shadow.get(stage, (None,))[0] == name:
+                del self._shadow[stage]
+
+    def set_shadow(self, stage: str, name: Optional[str], fraction: float = 0.1) -> None:
+        """
+        Mirror `fraction` of stage traffic to backend `name`. Pass name=None to stop shadowing.
+        """
+        if name is None:
+            with self._lock:
+                self._shadow.pop(stage, None)
+            return
+        self._load(stage, name)
+        with self._lock:
+            if not 0.0 <= fraction <= 1.0:
+                raise ValueError("Shadow fraction must be between 0 and 1.")
+            if name == self._active.get(stage):
+                raise ValueError(f"Backend '{name}' is already active for stage '{stage}'.")
+            self._shadow[stage] = (name, fraction)
+
+    def _check(self, stage: str, name: str) -> None:
+        if stage not in self._backends:
+            raise KeyError(f"Unknown stage: {stage}")
+        if name not in self._backends[stage]:
+            raise KeyError(f"Unknown backend '{name}' for stage '{stage}'. Available: {sorted(self._backends[stage])}")
+
+    def _load(self, stage: str, name: str) -> Callable:
+        with self._lock:
+            self._check(stage, name)
+        try:
+            return self._get(stage, name)
+        except (ImportError, AttributeError, TypeError) as e:
+            raise ValueError(f"Backend '{name}' for stage '{stage}' cannot be loaded: {e}") from e
+
+    def _get(self, stage: str, name: str) -> Callable:
+        with self._lock:
+            target = self._backends[stage][name]
+        fn = _resolve(target)
+        if fn is not target:
+            with self._lock:
+                # Cache the resolved callable unless the entry was replaced meanwhile
+                if self._backends[stage].get(name) is target:
+                    self._backends[stage][name] = fn
+        return fn
+
+    def _timed(self, stage: str, name: str, role: str, fn: Callable, args: tuple, kwargs: dict):
+        start, thread_start, children_start = time.perf_counter(), _thread_cpu_seconds(), _children_cpu_seconds()
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            cpu_ms = ((_thread_cpu_seconds() - thread_start) + (_children_cpu_seconds() - children_start)) * 1000
+            with self._lock:
+                stats = self._stats.setdefault((stage, name, role), _Stats(self._window))
+                stats.record(latency_ms, cpu_ms, ok)
+
+    def run(self, stage: str, *args, **kwargs):
+        """
+        Call the active backend for stage and return its result, mirroring to the shadow if sampled.
+        """
+        with self._lock:
+            if stage not in self._active:
+                raise KeyError(f"Unknown stage: {stage}")
+            name = self._active[stage]
+            shadow = self._shadow.get(stage)
+        result = self._timed(stage, name, "primary", self._get(stage, name), args, kwargs)
+        if shadow and random.random() < shadow[1]:
+            self._submit_shadow(stage, name, shadow[0], result, args, kwargs)
+        return result
+
+    def _submit_shadow(self, stage: str, primary: str, candidate: str, primary_result, args: tuple, kwargs: dict) -> None:
+        with self._lock:
+            if self._pending_shadow >= self._max_pending_shadow:
+                # Shed shadow load rather than queue unboundedly behind live traffic
+                self._shadow_dropped[stage] = self._shadow_dropped.get(stage, 0) + 1
+                return
+            self._pending_shadow += 1
+        hooks = STAGE_HOOKS.get(stage, {})
+        try:
+            prepare = hooks.get("prepare_shadow")
+            cleanup = None
+            if prepare:
+                args, kwargs, cleanup = prepare(args, kwargs)
+        except Exception as e:
+            print(f"[Shadow] Could not prepare {stage}/{candidate}: {e}")
+            self._shadow_done()
+            return
+        try:
+            self._executor.submit(self._run_shadow, stage, primary, candidate, primary_result, args, kwargs, cleanup)
+        except RuntimeError as e:
+            # Executor already shut down; the primary result must still reach the caller
+            print(f"[Shadow] Could not submit {stage}/{candidate}: {e}")
+            self._cleanup(cleanup)
+            self._shadow_done()
+
+    def _cleanup(self, cleanup: Optional[Callable[[], None]]) -> None:
+        if cleanup:
+            try:
+                cleanup()
+            except OSError:
+                pass
+
+    def _shadow_done(self) -> None:
+        with self._lock:
+            self._pending_shadow -= 1
+            self._idle.notify_all()
+
+    def _run_shadow(self, stage, primary, candidate, primary_result, args, kwargs, cleanup) -> None:
+        try:
+            result = self._timed(stage, candidate, "shadow", self._get(stage, candidate), args, kwargs)
+            compare = STAGE_HOOKS.get(stage, {}).get("compare")
+            if compare:
+                agreed = bool(compare(primary_result, result))
+                with self._lock:
+                    counts = self._agreement.setdefault((stage, primary, candidate), [0, 0])
+                    counts[0] += 1
+                    counts[1] += int(agreed)
+        except Exception as e:
+            print(f"[Shadow] {stage}/{candidate} failed: {e}")
+        finally:
+            self._cleanup(cleanup)
+            self._shadow_done()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until no shadow calls are queued or running. Returns False on timeout.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending_shadow == 0, timeout)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the shadow worker pool, optionally waiting for queued shadow calls to finish.
+        """
+        self._executor.shutdown(wait=wait)
+
+    def describe(self) -> Dict[str, Any]:
+        """
+        Return available, active and shadow backends per stage.
+        """
+        with self._lock:
+            return {
+                stage: {
+                    "backends": sorted(backends),
+                    "active": self._active.get(stage),
+                    "shadow": (
+                        {"backend": self._shadow[stage][0], "fraction": self._shadow[stage][1]}
+                        if stage in self._shadow else None
+                    ),
+                }
+                for stage, backends in self._backends.items()
+            }
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Return per-backend stats for primary and shadow calls side by side, plus shadow
+        agreement rates, for each stage.
+        """
+        def stage_entry(stage: str) -> Dict[str, Any]:
+            return out.setdefault(stage, {"primary": {}, "shadow": {}, "agreement": {}})
+
+        with self._lock:
+            out: Dict[str, Any] = {}
+            for (stage, name, role), stats in self._stats.items():
+                stage_entry(stage)[role][name] = stats.summary()
+            for (stage, primary, candidate), (compared, agreed) in self._agreement.items():
+                stage_entry(stage)["agreement"][f"{primary}->{candidate}"] = {
+                    "compared": compared,
+                    "agreed": agreed,
+                    "rate": round(agreed / compared, 4) if compared else None,
+                }
+            for stage, dropped in self._shadow_dropped.items():
+                stage_entry(stage)["shadow_dropped"] = dropped
+            return out
+
+    def load_config(self, path: str, shadow: bool = True) -> None:
+        """
+        Register backends and set active (and, if shadow is true, shadow) backends from a
+        YAML file:
+
+        backends:
+          transcribe:
+            whisper-small: mypkg.stt:transcribe_small
+        active:
+          transcribe: whisper
+        shadow:
+          transcribe: {backend: whisper-small, fraction: 0.05}
+        """
+        config = _read_config(path)
+        for stage, backends in (config.get("backends") or {}).items():
+            for name, target in backends.items():
+                self.register(stage, name, target)
+        for stage, name in (config.get("active") or {}).items():
+            self.set_active(stage, name)
+        if shadow:
+            self.load_shadow_config(path)
+
+    def load_shadow_config(self, path: str) -> None:
+        """
+        Apply only the `shadow:` section of a YAML config file (see load_config).
+        """
+        config = _read_config(path)
+        for stage, shadow in (config.get("shadow") or {}).items():
+            self.set_shadow(stage, shadow["backend"], float(shadow.get("fraction", 0.1)))
+
+
+def _read_config(path: str) -> Dict[str, Any]:
+    import yaml
+
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def config_path() -> str:
+    """
+    Return the registry config file: $AI_MEDIA_CONFIG or orchestrator/config.yaml.
+    """
+    return os.environ.get("AI_MEDIA_CONFIG", os.path.join(os.path.dirname(__file__), "config.yaml"))
+
+
+_default_registry: Optional[StageRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_registry() -> StageRegistry:
+    """
+    Return the process-wide StageRegistry with the built-in backends registered and the
+    backends/active sections of config_path() applied. Shadow settings are left off here:
+    only the HTTP server, which exposes /admin/metrics, enables them (load_shadow_config).
+    """
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            registry = StageRegistry()
+            for stage, backends in DEFAULT_BACKENDS.items():
+                for name, target in backends.items():
+                    registry.register(stage, name, target)
+            path = config_path()
+            if os.path.isfile(path):
+                registry.load_config(path, shadow=False)
+            _default_registry = registry
+        return _default_registry
@@ -0,0 +1,216 @@
+import json
+from abc import ABC, abstractmethod
+import os
+import struct
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+SINK_NAMES = ["json", "parquet"]
+
+
+class ResultSink(ABC):
+    """
+    Destination for pipeline results. Call write() once per processed input and close() when done.
+    """
+
+    @abstractmethod
+    def write(self, source: str, kind: str, result: Dict[str, Any]) -> None:
+        ...
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class JsonSink(ResultSink):
+    """
+    Writes each result as a pretty-printed JSON file (the original CLI output format).
+    If output is a directory, one <input file name>.json file (e.g. a.wav.json) is written
+    per source; the input extension is kept so a.wav and a.png do not collide.
+    """
+
+    def __init__(self, output: str):
+        self.output = output
+
+    def write(self, source: str, kind: str, result: Dict[str, Any]) -> None:
+        path = self.output
+        if os.path.isdir(path):
+            path = os.path.join(path, f"{os.path.basename(source)}.json")
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+def encode_segment_times(timestamps: Sequence[Dict[str, Any]]) -> bytes:
+    """
+    Pack segment (start, end) pairs as little-endian float32.
+    """
+    flat: List[float] = []
+    for seg in timestamps:
+        flat.extend((seg["start"], seg["end"]))
+    return struct.pack(f"<{len(flat)}f", *flat)
+
+
+def decode_segment_times(blob: Optional[bytes]) -> List[Dict[str, float]]:
+    """
+    Inverse of encode_segment_times: returns [{'start': s, 'end': e}, ...].
+    """
+    if not blob:
+        return []
+    flat = struct.unpack(f"<{len(blob) // 4}f", blob)
+    return [{"start": flat[i], "end": flat[i + 1]} for i in range(0, len(flat), 2)]
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("source", pa.string()),
+        ("kind", pa.dictionary(pa.int8(), pa.string())),
+        ("created_at", pa.timestamp("ms", tz="UTC")),
+        ("intent", pa.dictionary(pa.int16(), pa.string())),
+        ("params", pa.map_(pa.string(), pa.string())),
+        ("fields", pa.map_(pa.string(), pa.string())),
+        ("confidence", pa.float32()),
+        ("segment_times", pa.binary()),
+        ("segment_text", pa.list_(pa.string())),
+        ("text", pa.large_string()),
+    ])
+
+
+# Columns that hold full transcripts / OCR text; the query helper skips them by default
+TEXT_COLUMNS = ("text", "segment_text", "segment_times")
+
+
+def _to_map(items: Iterable[Tuple[str, Any]]) -> List[Tuple[str, Optional[str]]]:
+    # Map values are strings; None stays a null value rather than becoming "None"
+    return [(k, None if v is None else str(v)) for k, v in items]
+
+
+def _to_row(source: str, kind: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    row: Dict[str, Any] = {
+        "source": source,
+        "kind": kind,
+        "created_at": datetime.now(timezone.utc),
+        "intent": None,
+        "params": None,
+        "fields": None,
+        "confidence": None,
+        "segment_times": None,
+        "segment_text": None,
+        "text": None,
+    }
+    if kind == "audio":
+        transcription = result.get("transcription", {})
+        nlu = result.get("intent", {})
+        timestamps = transcription.get("timestamps", [])
+        row["text"] = transcription.get("text")
+        row["confidence"] = transcription.get("confidence")
+        row["segment_times"] = encode_segment_times(timestamps)
+        row["segment_text"] = [seg.get("text", "") for seg in timestamps]
+        row["intent"] = nlu.get("intent")
+        row["params"] = _to_map(nlu.get("params", {}).items())
+    else:
+        row["text"] = result.get("text", result.get("raw_text"))
+        row["fields"] = _to_map((k, v) for k, v in result.items() if k not in ("text", "raw_text"))
+    return row
+
+
+class ParquetSink(ResultSink):
+    """
+    Append-only columnar sink. Results are buffered and written as Parquet row groups of
+    batch_size rows. Each sink instance adds one new part file to the output directory, so
+    existing files are never rewritten and the directory can be read as a single dataset.
+    """
+
+    def __init__(self, output: str, batch_size: int = 1024, compression: str = "zstd"):
+        self.output = output
+        self.batch_size = batch_size
+        self.compression = compression
+        self._rows: List[Dict[str, Any]] = []
+        self._writer = None
+        os.makedirs(output, exist_ok=True)
+        self.path = os.path.join(output, f"part-{int(time.time())}-{uuid.uuid4().hex[:8]}.parquet")
+
+    def write(self, source: str, kind: str, result: Dict[str, Any]) -> None:
+        self._rows.append(_to_row(source, kind, result))
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = _arrow_schema()
+        table = pa.Table.from_pylist(self._rows, schema=schema)
+        if self._writer is None:
+            # Write to a hidden temp name so readers never see a half-written part file
+            self._writer = pq.ParquetWriter(self._tmp_path, schema, compression=self.compression)
+        self._writer.write_table(table)
+        self._rows = []
+
+    @property
+    def _tmp_path(self) -> str:
+        return os.path.join(self.output, "." + os.path.basename(self.path) + ".tmp")
+
+    def close(self) -> None:
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.replace(self._tmp_path, self.path)
+
+
+def open_sink(kind: str, output: str, batch_size: int = 1024) -> ResultSink:
+    """
+    Create a result sink by name (see SINK_NAMES).
+    """
+    if kind == "json":
+        return JsonSink(output)
+    if kind == "parquet":
+        return ParquetSink(output, batch_size=batch_size)
+    raise ValueError(f"Unknown sink: {kind}. Supported: json, parquet")
+
+
+def scan_results(
+    path: str,
+    columns: Optional[Iterable[str]] = None,
+    intent: Optional[str] = None,
+    kind: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Read rows from a Parquet result directory, optionally filtered by intent and/or kind.
+    By default only metadata columns are loaded (no transcripts or OCR text).
+    Map columns are returned as dicts.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(path, format="parquet")
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name not in TEXT_COLUMNS]
+    columns = list(columns)
+    expr = None
+    if intent is not None:
+        expr = ds.field("intent") == intent
+    if kind is not None:
+        kind_expr = ds.field("kind") == kind
+        expr = kind_expr if expr is None else expr & kind_expr
+    table = dataset.to_table(columns=columns, filter=expr)
+    rows = table.to_pylist()
+    for row in rows:
+        for key in ("params", "fields"):
+            if key in row and row[key] is not None:
+                row[key] = dict(row[key])
+    return rows
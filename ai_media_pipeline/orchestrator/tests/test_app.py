@@ -0,0 +1,119 @@
+import json
+import os
+import pytest
+
+pytest.importorskip("fastapi")
+from typer.testing import CliRunner
+
+from ai_media_pipeline.orchestrator import app as orchestrator
+
+
+def test_invalid_sink_rejected_before_processing(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(orchestrator, "_process_media", lambda file: calls.append(file))
+    audio = tmp_path / "input.wav"
+    audio.write_bytes(b"")
+    for args in (
+        ["process", "--file", str(audio), "--output", str(tmp_path / "out.json"), "--sink", "csv"],
+        ["batch", "--input-dir", str(tmp_path), "--output", str(tmp_path / "out"), "--sink", "csv"],
+    ):
+        result = CliRunner().invoke(orchestrator.app, args)
+        assert result.exit_code == 2
+        assert "csv" in result.output
+    assert calls == []
+
+
+def test_process_writes_through_json_sink(tmp_path, monkeypatch):
+    monkeypatch.setattr(orchestrator, "_process_media", lambda file: ("image", {"text": "Name: John Doe"}))
+    image = tmp_path / "doc.png"
+    image.write_bytes(b"")
+    output = tmp_path / "doc.json"
+    result = CliRunner().invoke(orchestrator.app, ["process", "--file", str(image), "--output", str(output)])
+    assert result.exit_code == 0
+    assert output.read_text().startswith("{\n  \"text\"")
+
+
+@pytest.fixture
+def admin_client(monkeypatch):
+    from fastapi.testclient import TestClient
+    from ai_media_pipeline.orchestrator.backends import StageRegistry
+
+    registry = StageRegistry()
+    monkeypatch.setattr(orchestrator, "get_registry", lambda: registry)
+    monkeypatch.setenv("AI_MEDIA_ADMIN_TOKEN", "secret")
+    # A single client shares one event loop across requests, like a real server
+    with TestClient(orchestrator.fastapi_app) as client:
+        yield client, registry
+    registry.shutdown()
+
+
+def test_admin_requires_configured_token(admin_client, monkeypatch):
+    client, _ = admin_client
+    assert client.get("/admin/backends").status_code == 403
+    assert client.get("/admin/backends", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/admin/backends", headers={"X-Admin-Token": "secret"}).status_code == 200
+    monkeypatch.delenv("AI_MEDIA_ADMIN_TOKEN")
+    assert client.get("/admin/backends", headers={"X-Admin-Token": ""}).status_code == 403
+
+
+def test_admin_rejects_unimportable_backend(admin_client):
+    client, registry = admin_client
+    registry.register("extract", "ocr", lambda path: {"text": ""})
+    registry.register("extract", "typo", "no_such_module:parse_document")
+    headers = {"X-Admin-Token": "secret"}
+    res = client.post("/admin/backends/extract/active", json={"backend": "typo"}, headers=headers)
+    assert res.status_code == 400
+    res = client.post("/admin/backends/extract/shadow", json={"backend": "typo", "fraction": 0.5}, headers=headers)
+    assert res.status_code == 400
+    assert registry.describe()["extract"]["active"] == "ocr"
+
+
+def test_hot_swap_via_endpoint_during_process_request(admin_client):
+    import threading
+
+    client, registry = admin_client
+    started, release = threading.Event(), threading.Event()
+
+    def slow_ocr(path):
+        started.set()
+        assert release.wait(5.0)
+        return {"text": "old"}
+
+    registry.register("extract", "old", slow_ocr)
+    registry.register("extract", "new", lambda path: {"text": "new"})
+    responses = []
+    worker = threading.Thread(target=lambda: responses.append(
+        client.post("/process", files={"file": ("doc.png", b"png")})
+    ))
+    worker.start()
+    try:
+        assert started.wait(5.0)
+        # Served while /process is still blocked inside the old backend
+        res = client.post("/admin/backends/extract/active", json={"backend": "new"}, headers={"X-Admin-Token": "secret"})
+        assert res.status_code == 200
+        assert res.json()["active"] == "new"
+    finally:
+        release.set()
+        worker.join(5.0)
+    assert responses[0].json() == {"text": "old"}
+    assert client.post("/process", files={"file": ("doc.png", b"png")}).json() == {"text": "new"}
+
+
+def test_batch_json_keeps_same_stem_inputs_apart(tmp_path, monkeypatch):
+    monkeypatch.setattr(orchestrator, "_process_media", lambda file: ("image", {"text": os.path.basename(file)}))
+    inputs = tmp_path / "in"
+    inputs.mkdir()
+    (inputs / "a.wav").write_bytes(b"")
+    (inputs / "a.png").write_bytes(b"")
+    output = tmp_path / "out"
+    result = CliRunner().invoke(orchestrator.app, ["batch", "--input-dir", str(inputs), "--output", str(output), "--sink", "json"])
+    assert result.exit_code == 0
+    assert sorted(os.listdir(output)) == ["a.png.json", "a.wav.json"]
+    assert json.loads((output / "a.wav.json").read_text()) == {"text": "a.wav"}
+
+
+def test_batch_missing_input_dir(tmp_path):
+    result = CliRunner().invoke(orchestrator.app, ["batch", "--input-dir", str(tmp_path / "missing"), "--output", str(tmp_path / "out")])
+    assert result.exit_code == 1
+    assert "[ERROR] Input directory not found" in result.output
+    assert result.exception is None or isinstance(result.exception, SystemExit)
@@ -0,0 +1,237 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+
+from ai_media_pipeline.orchestrator import backends
+from ai_media_pipeline.orchestrator.backends import StageRegistry
+
+
+@pytest.fixture
+def registry():
+    registry = StageRegistry()
+    yield registry
+    registry.shutdown()
+
+
+def test_hot_swap_keeps_in_flight_call_on_old_backend(registry):
+    started, release = threading.Event(), threading.Event()
+
+    def slow(text):
+        started.set()
+        release.wait(1.0)
+        return {"intent": "old", "params": {}}
+
+    registry.register("interpret", "old", slow)
+    registry.register("interpret", "new", lambda text: {"intent": "new", "params": {}})
+    results = []
+    worker = threading.Thread(target=lambda: results.append(registry.run("interpret", "hi")))
+    worker.start()
+    started.wait(1.0)
+    registry.set_active("interpret", "new")
+    release.set()
+    worker.join()
+    assert results == [{"intent": "old", "params": {}}]
+    assert registry.run("interpret", "hi")["intent"] == "new"
+
+
+def test_shadow_records_latency_and_agreement(registry):
+    registry.register("interpret", "primary", lambda text: {"intent": "get_information", "params": {}})
+    registry.register("interpret", "candidate", lambda text: {"intent": "unknown", "params": {}})
+    registry.set_shadow("interpret", "candidate", fraction=1.0)
+    result = registry.run("interpret", "Tell me about the Toyota Corolla.")
+    assert registry.wait_idle(timeout=2.0)
+    assert result["intent"] == "get_information"
+    metrics = registry.metrics()["interpret"]
+    assert metrics["primary"]["primary"]["calls"] == 1
+    assert metrics["shadow"]["candidate"]["calls"] == 1
+    assert metrics["agreement"]["primary->candidate"] == {"compared": 1, "agreed": 0, "rate": 0.0}
+
+
+def test_promoted_backend_keeps_roles_separate(registry):
+    registry.register("interpret", "a", lambda text: {"intent": "x", "params": {}})
+    registry.register("interpret", "b", lambda text: {"intent": "x", "params": {}})
+    registry.set_shadow("interpret", "b", fraction=1.0)
+    registry.run("interpret", "hi")
+    assert registry.wait_idle(timeout=2.0)
+    registry.set_active("interpret", "b")
+    registry.run("interpret", "hi")
+    metrics = registry.metrics()["interpret"]
+    assert metrics["shadow"]["b"]["calls"] == 1
+    assert metrics["primary"]["b"]["calls"] == 1
+
+
+def test_shadow_dropped_when_backlog_full():
+    registry = StageRegistry(shadow_workers=1, max_pending_shadow=1)
+    release = threading.Event()
+
+    def blocked(text):
+        release.wait(2.0)
+        return {"intent": "x", "params": {}}
+
+    registry.register("interpret", "primary", lambda text: {"intent": "x", "params": {}})
+    registry.register("interpret", "candidate", blocked)
+    registry.set_shadow("interpret", "candidate", fraction=1.0)
+    registry.run("interpret", "one")
+    registry.run("interpret", "two")
+    release.set()
+    assert registry.wait_idle(timeout=2.0)
+    registry.shutdown()
+    metrics = registry.metrics()["interpret"]
+    assert metrics["shadow_dropped"] == 1
+    assert metrics["shadow"]["candidate"]["calls"] == 1
+
+
+def test_shadow_gets_private_copy_of_input_file(registry, tmp_path):
+    src = tmp_path / "input.wav"
+    src.write_bytes(b"audio")
+    src_inode = os.stat(src).st_ino
+    release = threading.Event()
+    seen = {}
+
+    def candidate(path):
+        release.wait(2.0)
+        seen["path"] = path
+        seen["inode"] = os.stat(path).st_ino
+        with open(path, "rb") as f:
+            seen["data"] = f.read()
+        return {"text": "hello"}
+
+    registry.register("transcribe", "primary", lambda path: {"text": "hello"})
+    registry.register("transcribe", "candidate", candidate)
+    registry.set_shadow("transcribe", "candidate", fraction=1.0)
+    registry.run("transcribe", str(src))
+    # The API deletes its temp upload as soon as the primary returns
+    os.remove(src)
+    release.set()
+    assert registry.wait_idle(timeout=2.0)
+    assert seen["data"] == b"audio"
+    assert seen["path"] != str(src)
+    # Hard-linked rather than copied when the temp dir shares a filesystem with the upload
+    if os.stat(tmp_path).st_dev == os.stat(os.path.dirname(os.path.dirname(seen["path"]))).st_dev:
+        assert seen["inode"] == src_inode
+    assert not os.path.exists(seen["path"])
+    assert registry.metrics()["transcribe"]["agreement"]["primary->candidate"]["rate"] == 1.0
+
+
+def test_shadow_synthesize_writes_elsewhere(registry, tmp_path):
+    output = tmp_path / "reply.wav"
+    seen = {}
+
+    def write(tag):
+        def synth(text, output_path=None, **kwargs):
+            if tag == "candidate":
+                seen["path"] = output_path
+            with open(output_path, "w") as f:
+                f.write(tag)
+            return output_path
+        return synth
+
+    registry.register("synthesize", "primary", write("primary"))
+    registry.register("synthesize", "candidate", write("candidate"))
+    registry.set_shadow("synthesize", "candidate", fraction=1.0)
+    assert registry.run("synthesize", "hi", output_path=str(output)) == str(output)
+    assert registry.wait_idle(timeout=2.0)
+    assert output.read_text() == "primary"
+    assert seen["path"] != str(output)
+    assert not os.path.exists(seen["path"])
+
+
+def test_unknown_backend_rejected(registry):
+    registry.register("interpret", "primary", lambda text: {})
+    with pytest.raises(KeyError):
+        registry.set_active("interpret", "missing")
+    with pytest.raises(ValueError):
+        registry.set_shadow("interpret", "primary", fraction=0.5)
+
+
+def test_unimportable_backend_rejected(registry):
+    registry.register("interpret", "primary", lambda text: {"intent": "x", "params": {}})
+    registry.register("interpret", "typo", "ai_media_pipeline.orchestrator.backends:no_such_function")
+    registry.register("interpret", "missing", "no_such_module:parse_intent")
+    for name in ("typo", "missing"):
+        with pytest.raises(ValueError):
+            registry.set_active("interpret", name)
+        with pytest.raises(ValueError):
+            registry.set_shadow("interpret", name, fraction=0.5)
+    assert registry.describe()["interpret"]["active"] == "primary"
+    assert registry.describe()["interpret"]["shadow"] is None
+
+
+def _burn(seconds=0.02):
+    deadline = time.thread_time() + seconds
+    while time.thread_time() < deadline:
+        pass
+
+
+def test_cpu_recorded_for_every_call_with_shadow_active(registry, tmp_path):
+    audio = tmp_path / "input.wav"
+    audio.write_bytes(b"audio")
+    def transcribe(path):
+        _burn()
+        return {"text": "tell me about the corolla"}
+
+    def interpret(text):
+        _burn()
+        return {"intent": "get_information", "params": {}}
+
+    registry.register("transcribe", "primary", transcribe)
+    registry.register("transcribe", "candidate", transcribe)
+    registry.register("interpret", "spacy", interpret)
+    registry.set_shadow("transcribe", "candidate", fraction=1.0)
+    for _ in range(5):
+        # Same flow as /process: the next stage runs while the transcribe shadow is in flight
+        result = registry.run("transcribe", str(audio))
+        registry.run("interpret", result["text"])
+    assert registry.wait_idle(timeout=5.0)
+    metrics = registry.metrics()
+    for stats in (
+        metrics["transcribe"]["primary"]["primary"],
+        metrics["transcribe"]["shadow"]["candidate"],
+        metrics["interpret"]["primary"]["spacy"],
+    ):
+        assert stats["cpu_samples"] == stats["calls"] == 5
+        assert stats["cpu_ms_mean"] >= 15
+
+
+def test_cpu_includes_child_processes(registry):
+    code = "import time\nend = time.process_time() + 0.05\nwhile time.process_time() < end: pass"
+    registry.register("extract", "subprocess", lambda path: subprocess.run([sys.executable, "-c", code], check=True) and {"text": ""})
+    registry.run("extract", "doc.png")
+    assert registry.metrics()["extract"]["primary"]["subprocess"]["cpu_ms_mean"] >= 40
+
+
+def test_shadow_after_shutdown_does_not_fail_primary(tmp_path):
+    registry = StageRegistry()
+    registry.register("extract", "primary", lambda path: {"text": "ok"})
+    registry.register("extract", "candidate", lambda path: {"text": "ok"})
+    registry.set_shadow("extract", "candidate", fraction=1.0)
+    registry.shutdown()
+    src = tmp_path / "doc.png"
+    src.write_bytes(b"png")
+    assert registry.run("extract", str(src)) == {"text": "ok"}
+    assert registry.wait_idle(timeout=1.0)
+
+
+def test_default_registry_leaves_config_shadow_off(tmp_path, monkeypatch):
+    pytest.importorskip("yaml")
+    config = tmp_path / "config.yaml"
+    config.write_text(
+        "backends:\n"
+        "  interpret:\n"
+        "    candidate: ai_media_pipeline.orchestrator.backends:_normalize_text\n"
+        "shadow:\n"
+        "  interpret: {backend: candidate, fraction: 0.5}\n"
+    )
+    monkeypatch.setenv("AI_MEDIA_CONFIG", str(config))
+    monkeypatch.setattr(backends, "_default_registry", None)
+    registry = backends.get_registry()
+    try:
+        assert "candidate" in registry.describe()["interpret"]["backends"]
+        assert registry.describe()["interpret"]["shadow"] is None
+        registry.load_shadow_config(backends.config_path())
+        assert registry.describe()["interpret"]["shadow"] == {"backend": "candidate", "fraction": 0.5}
+    finally:
+        registry.shutdown()
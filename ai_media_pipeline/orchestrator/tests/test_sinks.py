@@ -0,0 +1,60 @@
+import json
+import os
+import pytest
+
+from ai_media_pipeline.orchestrator import sinks
+
+
+AUDIO_RESULT = {
+    "transcription": {
+        "text": " Tell me about the Toyota Corolla.",
+        "confidence": 0.8,
+        "timestamps": [{"start": 0.0, "end": 2.5, "text": " Tell me about the Toyota Corolla."}],
+    },
+    "intent": {"intent": "get_information", "params": {"car_make": "Toyota", "car_model": "Corolla"}},
+}
+IMAGE_RESULT = {"text": "Name: John Doe\nReg No: ABC1234"}
+
+
+def test_segment_times_roundtrip():
+    blob = sinks.encode_segment_times(AUDIO_RESULT["transcription"]["timestamps"])
+    assert len(blob) == 8
+    assert sinks.decode_segment_times(blob) == [{"start": 0.0, "end": 2.5}]
+
+
+def test_json_sink_writes_legacy_format(tmp_path):
+    output = tmp_path / "input.json"
+    with sinks.open_sink("json", str(output)) as sink:
+        sink.write("input.wav", "audio", AUDIO_RESULT)
+    assert json.loads(output.read_text()) == AUDIO_RESULT
+
+
+def test_parquet_sink_append_and_scan(tmp_path):
+    pytest.importorskip("pyarrow")
+    output = str(tmp_path / "results")
+    for _ in range(2):
+        with sinks.open_sink("parquet", output, batch_size=1) as sink:
+            sink.write("input.wav", "audio", AUDIO_RESULT)
+            sink.write("doc.png", "image", IMAGE_RESULT)
+    # Each sink session appends one part file
+    assert len([f for f in os.listdir(output) if f.endswith(".parquet")]) == 2
+    rows = sinks.scan_results(output, intent="get_information")
+    assert len(rows) == 2
+    assert rows[0]["params"] == {"car_make": "Toyota", "car_model": "Corolla"}
+    assert "text" not in rows[0]
+    images = sinks.scan_results(output, columns=["source", "text"], kind="image")
+    assert [r["text"] for r in images] == [IMAGE_RESULT["text"]] * 2
+
+
+def test_result_sink_is_abstract():
+    with pytest.raises(TypeError):
+        sinks.ResultSink()
+
+
+def test_parquet_sink_keeps_null_params(tmp_path):
+    pytest.importorskip("pyarrow")
+    output = str(tmp_path / "results")
+    result = {"transcription": {"text": "", "timestamps": []}, "intent": {"intent": "unknown", "params": {"date": None}}}
+    with sinks.open_sink("parquet", output) as sink:
+        sink.write("input.wav", "audio", result)
+    assert sinks.scan_results(output)[0]["params"] == {"date": None}
@@ -0,0 +1,232 @@
+import hashlib
+import os
+import subprocess
+import threading
+import wave
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+# Whisper operates on 16 kHz mono float32 audio
+SAMPLE_RATE = 16000
+DEFAULT_MAX_CACHE_BYTES = 1 << 30
+DEFAULT_MAX_MEMORY_BYTES = 256 << 20
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    Return the SHA-256 hex digest of a file's contents.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _pcm_to_float(frames: bytes, sample_width: int) -> np.ndarray:
+    if sample_width == 1:
+        # 8-bit WAV is unsigned
+        return (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    if sample_width == 2:
+        return np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    if sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        return ints.astype(np.float32) / 8388608.0
+    if sample_width == 4:
+        return np.frombuffer(frames, dtype="<i4").astype(np.float32) / 2147483648.0
+    raise ValueError(f"Unsupported WAV sample width: {sample_width}")
+
+
+def _decode_wav(path: str) -> Optional[np.ndarray]:
+    # Raises wave.Error for non-PCM WAV files and returns None for rates other than 16 kHz;
+    # the caller falls back to ffmpeg, which resamples in a streaming fashion
+    with wave.open(path, "rb") as w:
+        channels = w.getnchannels()
+        sample_width = w.getsampwidth()
+        if w.getframerate() != SAMPLE_RATE:
+            return None
+        frames = w.readframes(w.getnframes())
+    audio = _pcm_to_float(frames, sample_width)
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    return audio
+
+
+def _decode_ffmpeg(path: str) -> np.ndarray:
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-",
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(out, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def decode_audio(path: str) -> np.ndarray:
+    """
+    Decode an audio file to 16 kHz mono float32.
+    16 kHz PCM WAV is decoded in-process; everything else goes through a single ffmpeg call.
+    """
+    if path.lower().endswith(".wav"):
+        try:
+            audio = _decode_wav(path)
+            if audio is not None:
+                return audio
+        except (wave.Error, EOFError, ValueError):
+            pass
+    return _decode_ffmpeg(path)
+
+
+class AudioFrontend:
+    """
+    Decodes each distinct audio file once and shares the waveform between consumers.
+    Waveforms are keyed by content hash and kept in an in-process LRU bounded by
+    max_entries and max_memory_bytes (or $AI_MEDIA_AUDIO_MEMORY_MAX_MB). If cache_dir
+    (or $AI_MEDIA_AUDIO_CACHE) is set they are also persisted as .npy files, memory-mapped
+    on load, with the least recently used files evicted once the directory exceeds
+    max_cache_bytes (or $AI_MEDIA_AUDIO_CACHE_MAX_MB).
+
+    load() returns read-only views because the buffer is shared between consumers;
+    copy it before modifying it in place.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_entries: int = 8,
+        max_cache_bytes: Optional[int] = None,
+        max_memory_bytes: Optional[int] = None,
+    ):
+        self.cache_dir = cache_dir or os.environ.get("AI_MEDIA_AUDIO_CACHE")
+        if max_cache_bytes is None:
+            max_mb = os.environ.get("AI_MEDIA_AUDIO_CACHE_MAX_MB")
+            max_cache_bytes = int(max_mb) << 20 if max_mb else DEFAULT_MAX_CACHE_BYTES
+        self.max_cache_bytes = max_cache_bytes
+        if max_memory_bytes is None:
+            max_mb = os.environ.get("AI_MEDIA_AUDIO_MEMORY_MAX_MB")
+            max_memory_bytes = int(max_mb) << 20 if max_mb else DEFAULT_MAX_MEMORY_BYTES
+        self.max_memory_bytes = max_memory_bytes
+        self.max_entries = max_entries
+        self._memory_bytes = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, digest: str) -> Optional[np.ndarray]:
+        with self._lock:
+            arr = self._entries.get(digest)
+            if arr is not None:
+                self._entries.move_to_end(digest)
+            return arr
+
+    def _put(self, digest: str, arr: np.ndarray) -> None:
+        # Memory-mapped entries are backed by the page cache, not the heap
+        size = 0 if isinstance(arr, np.memmap) else arr.nbytes
+        if size > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(digest, None)
+            if old is not None and not isinstance(old, np.memmap):
+                self._memory_bytes -= old.nbytes
+            self._entries[digest] = arr
+            self._memory_bytes += size
+            while len(self._entries) > self.max_entries or self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                if not isinstance(evicted, np.memmap):
+                    self._memory_bytes -= evicted.nbytes
+
+    def _read_cached(self, digest: str) -> Optional[np.ndarray]:
+        if not self.cache_dir:
+            return None
+        path = os.path.join(self.cache_dir, f"{digest}.npy")
+        try:
+            arr = np.load(path, mmap_mode="r")
+            os.utime(path)  # mark as recently used for eviction
+            return arr
+        except (OSError, ValueError):
+            return None
+
+    def _write_cached(self, digest: str, arr: np.ndarray) -> np.ndarray:
+        if not self.cache_dir:
+            return arr
+        path = os.path.join(self.cache_dir, f"{digest}.npy")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp_path, path)
+            self._evict(keep=path)
+            return np.load(path, mmap_mode="r")
+        except OSError as e:
+            print(f"[Audio] Could not write cache entry {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return arr
+
+    def _evict(self, keep: str) -> None:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_cache_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def load(self, path: str, digest: Optional[str] = None) -> np.ndarray:
+        """
+        Return the 16 kHz mono float32 waveform for path, decoding it at most once.
+        The result is a read-only view of the shared buffer.
+        """
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"File not found: {path}")
+        digest = digest or file_digest(path)
+        arr = self._get(digest)
+        if arr is None:
+            arr = self._read_cached(digest)
+        if arr is None:
+            arr = self._write_cached(digest, np.ascontiguousarray(decode_audio(path), dtype=np.float32))
+        self._put(digest, arr)
+        view = arr.view()
+        view.flags.writeable = False
+        return view
+
+    def duration(self, path: str) -> float:
+        """
+        Return the duration of path in seconds.
+        """
+        return self.load(path).shape[0] / SAMPLE_RATE
+
+
+_default_frontend: Optional[AudioFrontend] = None
+_default_frontend_lock = threading.Lock()
+
+
+def get_frontend() -> AudioFrontend:
+    """
+    Return the process-wide AudioFrontend shared by all pipeline stages.
+    """
+    global _default_frontend
+    with _default_frontend_lock:
+        if _default_frontend is None:
+            _default_frontend = AudioFrontend()
+        return _default_frontend
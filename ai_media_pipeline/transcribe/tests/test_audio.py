@@ -0,0 +1,157 @@
+import sys
+import os
+import wave
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from transcribe import audio
+
+
+def _write_wav(path, samples, sr, channels=1):
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sr)
+        w.writeframes(pcm.tobytes())
+
+
+def _no_decode(path):
+    raise AssertionError("audio was decoded again")
+
+
+def test_decode_wav_downmixes_to_mono(tmp_path):
+    t = np.arange(audio.SAMPLE_RATE) / audio.SAMPLE_RATE
+    tone = 0.5 * np.sin(2 * np.pi * 440 * t)
+    stereo = np.stack([tone, tone], axis=1).reshape(-1)
+    path = tmp_path / "tone.wav"
+    _write_wav(path, stereo, audio.SAMPLE_RATE, channels=2)
+    decoded = audio.decode_audio(str(path))
+    assert decoded.dtype == np.float32
+    assert decoded.shape == (audio.SAMPLE_RATE,)
+    assert abs(np.abs(decoded).max() - 0.5) < 0.01
+
+
+def test_decode_wav_other_rate_uses_ffmpeg(tmp_path, monkeypatch):
+    path = tmp_path / "tone.wav"
+    _write_wav(path, np.zeros(8000), 8000)
+    calls = []
+    monkeypatch.setattr(audio, "_decode_ffmpeg", lambda p: calls.append(p) or np.zeros(16000, dtype=np.float32))
+    assert audio.decode_audio(str(path)).shape == (16000,)
+    assert calls == [str(path)]
+
+
+def test_frontend_caches_by_content(tmp_path):
+    samples = np.zeros(audio.SAMPLE_RATE // 2)
+    first = tmp_path / "a.wav"
+    second = tmp_path / "b.wav"
+    _write_wav(first, samples, audio.SAMPLE_RATE)
+    _write_wav(second, samples, audio.SAMPLE_RATE)
+    frontend = audio.AudioFrontend(cache_dir=str(tmp_path / "cache"))
+    wav_a = frontend.load(str(first))
+    wav_b = frontend.load(str(second))
+    # Identical content shares one buffer and one cache file
+    assert np.shares_memory(wav_a, wav_b)
+    assert len(os.listdir(tmp_path / "cache")) == 1
+    assert frontend.duration(str(first)) == pytest.approx(0.5)
+
+
+def test_disk_cache_hit_skips_decode(tmp_path, monkeypatch):
+    path = tmp_path / "a.wav"
+    _write_wav(path, np.full(1600, 0.25), audio.SAMPLE_RATE)
+    cache_dir = str(tmp_path / "cache")
+    expected = audio.AudioFrontend(cache_dir=cache_dir).load(str(path))
+    monkeypatch.setattr(audio, "decode_audio", _no_decode)
+    cached = audio.AudioFrontend(cache_dir=cache_dir).load(str(path))
+    assert isinstance(cached, np.memmap)
+    np.testing.assert_array_equal(cached, expected)
+
+
+def test_disk_cache_is_opt_in(tmp_path, monkeypatch):
+    monkeypatch.delenv("AI_MEDIA_AUDIO_CACHE", raising=False)
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "a.wav"
+    _write_wav(path, np.zeros(1600), audio.SAMPLE_RATE)
+    frontend = audio.AudioFrontend()
+    assert frontend.cache_dir is None
+    frontend.load(str(path))
+    assert os.listdir(tmp_path) == ["a.wav"]
+
+
+def test_unwritable_cache_falls_back_to_memory(tmp_path):
+    path = tmp_path / "a.wav"
+    _write_wav(path, np.full(1600, 0.25), audio.SAMPLE_RATE)
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("")
+    frontend = audio.AudioFrontend(cache_dir=str(blocker / "cache"))
+    wav = frontend.load(str(path))
+    assert wav.shape == (1600,)
+    assert not isinstance(wav, np.memmap)
+    assert np.shares_memory(frontend.load(str(path)), wav)
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache_dir = tmp_path / "cache"
+    # Each entry is 1600 float32 samples (~6.5 KB); allow room for two
+    frontend = audio.AudioFrontend(cache_dir=str(cache_dir), max_entries=1, max_cache_bytes=14000)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.wav"
+        _write_wav(path, np.full(1600, 0.1 * (i + 1)), audio.SAMPLE_RATE)
+        frontend.load(str(path))
+        # Distinct mtimes so eviction order is deterministic
+        for name in os.listdir(cache_dir):
+            entry = cache_dir / name
+            os.utime(entry, (entry.stat().st_atime, entry.stat().st_mtime - 10))
+        paths.append(path)
+    remaining = sorted(os.listdir(cache_dir))
+    assert len(remaining) == 2
+    assert f"{audio.file_digest(str(paths[0]))}.npy" not in remaining
+
+
+def test_loaded_waveform_is_read_only(tmp_path):
+    path = tmp_path / "a.wav"
+    _write_wav(path, np.full(1600, 0.25), audio.SAMPLE_RATE)
+    frontend = audio.AudioFrontend()
+    wav = frontend.load(str(path))
+    with pytest.raises(ValueError):
+        wav[0] = 1.0
+    assert frontend.load(str(path))[0] == pytest.approx(0.25, abs=1e-3)
+
+
+def test_memory_cache_bounded_by_bytes(tmp_path, monkeypatch):
+    # Each waveform is 1600 float32 samples = 6400 bytes; allow room for two
+    frontend = audio.AudioFrontend(max_entries=8, max_memory_bytes=13000)
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.wav"
+        _write_wav(path, np.full(1600, 0.1 * (i + 1)), audio.SAMPLE_RATE)
+        frontend.load(str(path))
+        paths.append(path)
+    assert len(frontend._entries) == 2
+    assert frontend._memory_bytes == 12800
+    # Oldest entry was evicted, so loading it decodes again
+    monkeypatch.setattr(audio, "decode_audio", _no_decode)
+    with pytest.raises(AssertionError):
+        frontend.load(str(paths[0]))
+
+
+def test_get_frontend_is_shared_across_threads(monkeypatch):
+    import threading
+
+    monkeypatch.setattr(audio, "_default_frontend", None)
+    barrier = threading.Barrier(8)
+    seen = []
+
+    def worker():
+        barrier.wait()
+        seen.append(audio.get_frontend())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(f) for f in seen}) == 1
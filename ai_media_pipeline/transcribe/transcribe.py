@@ -1,7 +1,10 @@
 import whisper
 import os
+import warnings
 from typing import Dict, Any
 
+from ai_media_pipeline.transcribe.audio import get_frontend
+
 
 def transcribe_audio(input_path: str) -> Dict[str, Any]:
     """
@@ -13,8 +16,13 @@ def transcribe_audio(input_path: str) -> Dict[str, Any]:
     if not os.path.isfile(input_path):
         raise FileNotFoundError(f"File not found: {input_path}")
     try:
+        # Decode once via the shared front-end instead of letting Whisper spawn ffmpeg
+        audio = get_frontend().load(input_path)
         model = whisper.load_model("base")
-        result = model.transcribe(input_path, word_timestamps=True)
+        with warnings.catch_warnings():
+            # The shared buffer is read-only; Whisper only reads it (padding makes a new tensor)
+            warnings.filterwarnings("ignore", message="The given NumPy array is not writable")
+            result = model.transcribe(audio, word_timestamps=True)
         text = result.get("text", "")
         segments = result.get("segments", [])
         # Calculate average confidence and collect timestamps